@@ -2,12 +2,13 @@
 이미지 처리 유틸리티 모듈
 프롬프트 정보 추출과 관련된 함수들을 포함
 """
-import gzip
 import json
+import os
+import zlib
+from dataclasses import dataclass
 from typing import Optional, Tuple
-from PIL import Image, ExifTags
-import piexif
-import piexif.helper
+import numpy as np
+from PIL import Image
 
 TARGETKEY_NAIDICT_OPTION = ("steps", "height", "width",
                             "scale", "seed", "sampler", "n_samples", "sm", "sm_dyn",
@@ -28,15 +29,25 @@ WEBUI_OPTION_MAPPING = {
     "denoising_strength": "denoising_strength"
 }
 
-def is_nai_exif(info_str):
-    """nai 이미지면 exif의 원본 JSON에 'Comment' 키가 존재하고 None이 아닌 경우 True를 반환"""
-    if not info_str:
-        return False
-    try:
-        data = json.loads(info_str)
-        return 'Comment' in data and data['Comment'] is not None
-    except Exception as e:
-        return False
+# read_info_from_image가 반환하는 프롬프트의 추출 방식 버전
+# 디스크 프롬프트 캐시(settings_manager)는 이 값이 다르면 버려지므로,
+# 같은 이미지에서 다른 프롬프트가 나오도록 추출 로직을 바꿀 때는 반드시 1 올릴 것
+PROMPT_EXTRACTOR_VERSION = 1
+
+# parse_webui_exif에서 토큰마다 리스트를 새로 만들지 않도록 미리 계산해 둔 키 집합
+_TARGETKEY_LOWER = frozenset(k.lower() for k in TARGETKEY_NAIDICT_OPTION)
+# _get_naidict_from_exifdict에서 "etc"로 분류하지 않을 키
+_EXCLUDED_ETC_KEYS = frozenset(TARGETKEY_NAIDICT_OPTION) | {
+    "prompt", "uc", "negative_prompt", "char_captions", "v4_prompt", "v4_negative_prompt"
+} | frozenset(WEBUI_OPTION_MAPPING)
+
+# stealth pnginfo 서명 -> (읽을 채널, gzip 압축 여부)
+_STEALTH_SIGNATURES = {
+    b'stealth_pnginfo': ('alpha', False),
+    b'stealth_pngcomp': ('alpha', True),
+    b'stealth_rgbinfo': ('rgb', False),
+    b'stealth_rgbcomp': ('rgb', True),
+}
 
 def parse_webui_exif(parameters_str):
     """
@@ -69,12 +80,10 @@ def parse_webui_exif(parameters_str):
 
     # 옵션 파싱
     for line in option_lines:
-        line = line.strip()
-        parts = line.split(',')
-        for part in parts:
-            part = part.strip()
-            if ':' in part:
-                key, value = part.split(':', 1)
+        for part in line.split(','):
+            # partition 한 번으로 구분자 확인과 key/value 분리를 함께 처리
+            key, sep, value = part.partition(':')
+            if sep:
                 key = key.strip().lower()
                 value = value.strip()
 
@@ -90,12 +99,14 @@ def parse_webui_exif(parameters_str):
                 if key in WEBUI_OPTION_MAPPING:
                     key = WEBUI_OPTION_MAPPING[key]
 
-                if key.lower() in [k.lower() for k in TARGETKEY_NAIDICT_OPTION]:
+                if key in _TARGETKEY_LOWER:
                     options[key] = value
                 else:
                     etc[key] = value
-            elif part:
-                etc[part] = ""
+            else:
+                part = part.strip()
+                if part:
+                    etc[part] = ""
 
     return {
         "prompt": prompt,
@@ -105,20 +116,31 @@ def parse_webui_exif(parameters_str):
         **etc  # 기타 필드 평탄화
     }
 
-def _get_exifdict_from_infostr(info_str):
+def _classify_info(info_str):
+    """
+    info 문자열을 한 번만 JSON 파싱하여 (종류, 파싱 결과)를 반환
+    종류: None(빈 값/오류), 'raw'(JSON 아님), 'nai'('Comment' 키가 있는 nai 원본 JSON), 'json'(그 외 JSON)
+    """
     if not info_str:
-        return None
+        return None, None
     try:
         data = json.loads(info_str)
-        # WebUI 형식의 경우 'parameters' 키가 존재함
-        if 'parameters' in data:
-            return parse_webui_exif(data['parameters'])
-        # nai 이미지라면 여기서 처리하지 않고 get_naidict_from_img에서 old 방식으로 처리함
-        elif 'Comment' in data:
-            return None
-        else:
-            return data
     except json.JSONDecodeError:
+        return 'raw', None
+    except Exception as e:
+        print("EXIF dictionary conversion error (general):", e)
+        return None, None
+    try:
+        if 'Comment' in data and data['Comment'] is not None:
+            return 'nai', data
+    except Exception:
+        pass
+    return 'json', data
+
+def _get_exifdict_from_classified(info_str, kind, data):
+    if kind is None:
+        return None
+    if kind == 'raw':
         # If it's not a valid JSON, it might be a raw WebUI parameter string
         # Check if it contains common WebUI parameter indicators
         if "Prompt:" in info_str or "Negative prompt:" in info_str or "Steps:" in info_str:
@@ -131,6 +153,15 @@ def _get_exifdict_from_infostr(info_str):
             # It's neither JSON nor a recognizable WebUI raw string
             print(f"EXIF dictionary conversion error: Not a valid JSON or WebUI string. Info: {info_str[:100]}...")
             return None
+    try:
+        # WebUI 형식의 경우 'parameters' 키가 존재함
+        if 'parameters' in data:
+            return parse_webui_exif(data['parameters'])
+        # nai 이미지라면 여기서 처리하지 않고 get_naidict_from_img에서 old 방식으로 처리함
+        elif 'Comment' in data:
+            return None
+        else:
+            return data
     except Exception as e:
         print("EXIF dictionary conversion error (general):", e)
         return None
@@ -225,11 +256,8 @@ def _get_naidict_from_exifdict(exif_dict):
 
         # 기타 정보 처리
         etc_dict = {}
-        excluded_keys = list(TARGETKEY_NAIDICT_OPTION) + ["prompt", "uc", "negative_prompt", "char_captions", "v4_prompt", "v4_negative_prompt"]
-        excluded_keys.extend(WEBUI_OPTION_MAPPING.keys())
-
         for key in exif_dict.keys():
-            if key not in excluded_keys:
+            if key not in _EXCLUDED_ETC_KEYS:
                 etc_dict[key] = exif_dict[key]
 
         nai_dict["etc"] = etc_dict
@@ -239,19 +267,37 @@ def _get_naidict_from_exifdict(exif_dict):
         print("Error in _get_naidict_from_exifdict:", e)
     return None
 
-def _get_infostr_from_img(img):
+@dataclass
+class ImgMeta:
+    """
+    이미지에서 한 번만 읽어 두는 프롬프트 관련 원본 문자열
+    (EXIF/PNG 텍스트 정보, stealth pnginfo, JPEG/WEBP EXIF UserComment)
+    """
+    exif_str: Optional[str] = None
+    pnginfo_str: Optional[str] = None
+    user_comment: Optional[str] = None
+
+# stealth pnginfo를 담을 수 없는 (항상 손실 압축인) 형식
+_LOSSY_ONLY_FORMATS = frozenset({'JPEG', 'MPO'})
+
+def _get_infostr_from_img(img) -> ImgMeta:
     exif_str = None
     pnginfo_str = None
+    user_comment = None
 
     # Try to get EXIF UserComment for WebP/JPEG
     if img.format in ["WEBP", "JPEG"]:
+        # piexif는 JPEG/WEBP에서만 필요하므로 처음 사용할 때 import (PNG만 처리할 때는 로드 비용 없음)
+        import piexif
+        import piexif.helper
         try:
             exif_bytes = img.info.get("exif")
             if exif_bytes:
                 exif_dict = piexif.load(exif_bytes)
                 user_comment_bytes = exif_dict.get("Exif", {}).get(piexif.ExifIFD.UserComment)
                 if user_comment_bytes:
-                    exif_str = piexif.helper.UserComment.load(user_comment_bytes)
+                    user_comment = piexif.helper.UserComment.load(user_comment_bytes)
+                    exif_str = user_comment
         except Exception as e:
             print(f"Error reading WebP/JPEG EXIF UserComment: {e}")
 
@@ -271,15 +317,17 @@ def _get_infostr_from_img(img):
             print(f"Error dumping img.info to JSON: {e}")
 
     # stealth pnginfo (should work for RGBA WebP too)
-    try:
-        # This function is already defined in image_utils.py, so we will call the existing one.
-        pnginfo_str = read_info_from_image_stealth(img)
-    except Exception as e:
-        print(f"Error reading stealth info: {e}")
+    # JPEG는 손실 압축으로 LSB가 보존되지 않으므로 픽셀 디코딩 없이 건너뜀
+    if img.format not in _LOSSY_ONLY_FORMATS:
+        try:
+            # This function is already defined in image_utils.py, so we will call the existing one.
+            pnginfo_str = read_info_from_image_stealth(img)
+        except Exception as e:
+            print(f"Error reading stealth info: {e}")
 
-    return exif_str, pnginfo_str
+    return ImgMeta(exif_str, pnginfo_str, user_comment)
 
-def get_naidict_from_img(img):
+def get_naidict_from_img(img, meta: Optional[ImgMeta] = None):
     # ComfyUI data parsing (commented out for now as comfyui_parser is not available)
     # if img.info and 'prompt' in img.info:
     #     try:
@@ -289,15 +337,19 @@ def get_naidict_from_img(img):
     #     except Exception as e:
     #         print(f"Error parsing ComfyUI data: {e}")
 
-    exif, pnginfo = _get_infostr_from_img(img)
+    if meta is None:
+        meta = _get_infostr_from_img(img)
+    exif, pnginfo = meta.exif_str, meta.pnginfo_str
     if not exif and not pnginfo:
         return None, 0
 
+    # 각 info 문자열은 한 번만 JSON 파싱하여 nai 판별과 WebUI 변환에 함께 사용
+    classified = [(info_str, *_classify_info(info_str)) for info_str in (exif, pnginfo)]
+
     # 먼저 nai 이미지 여부를 검사하여, nai 이미지면 old 방식으로 처리
-    for info_str in [exif, pnginfo]:
-        if is_nai_exif(info_str):
+    for info_str, kind, data in classified:
+        if kind == 'nai':
             try:
-                data = json.loads(info_str)
                 nai_exif = json.loads(data['Comment'])
                 nd = _get_naidict_from_exifdict(nai_exif)
                 if nd:
@@ -306,8 +358,8 @@ def get_naidict_from_img(img):
                 print(f"Error in nai old method extraction: {e}")
 
     # nai 이미지가 아니라면 WebUI 방식(new)으로 처리
-    ed1 = _get_exifdict_from_infostr(exif)
-    ed2 = _get_exifdict_from_infostr(pnginfo)
+    ed1 = _get_exifdict_from_classified(*classified[0])
+    ed2 = _get_exifdict_from_classified(*classified[1])
     if not ed1 and not ed2:
         return exif or pnginfo, 1
 
@@ -321,11 +373,108 @@ def get_naidict_from_img(img):
     else:
         return nd2, 3
 
-def read_info_from_image(image_path: str) -> str:
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_PNG_PROMPT_KEYS = (b'Comment', b'parameters')
+
+def _read_png_text_chunks(image_path: str) -> Optional[dict]:
+    """
+    PNG 청크 헤더만 순서대로 읽어 IDAT 이전의 'Comment', 'parameters' 텍스트 청크를 PIL과 같은 규칙으로 디코딩
+    다른 청크는 읽지 않고 seek로 건너뜀. PNG가 아니거나 IDAT에 도달하기 전에 파일이 끝나면 None을 반환
+    """
+    texts = {}
+    with open(image_path, 'rb') as f:
+        if f.read(len(_PNG_SIGNATURE)) != _PNG_SIGNATURE:
+            return None
+
+        while True:
+            # 청크 구조: [4B length][4B type][data][4B crc]
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            length = int.from_bytes(header[:4], 'big')
+            chunk_type = header[4:]
+            if chunk_type == b'IDAT':
+                return texts
+            if chunk_type not in (b'tEXt', b'zTXt', b'iTXt'):
+                f.seek(length + 4, os.SEEK_CUR)
+                continue
+
+            # 키워드(최대 79바이트 + NUL)만 먼저 읽고, 필요 없는 텍스트 청크는 본문을 건너뜀
+            head = f.read(min(length, 80))
+            key = head.partition(b'\0')[0]
+            if key not in _PNG_PROMPT_KEYS:
+                f.seek(length - len(head) + 4, os.SEEK_CUR)
+                continue
+            data = head + f.read(length - len(head))
+            if len(data) < length:
+                return None
+            f.seek(4, os.SEEK_CUR)
+
+            if chunk_type == b'tEXt' or chunk_type == b'zTXt':
+                value = data.partition(b'\0')[2]
+                if chunk_type == b'zTXt':
+                    if value[:1] not in (b'', b'\0'):
+                        return None
+                    try:
+                        value = zlib.decompress(value[1:])
+                    except zlib.error:
+                        value = b''
+                texts[key.decode('latin-1')] = value.decode('latin-1', 'replace')
+            else:
+                rest = data.partition(b'\0')[2]
+                if len(rest) < 2:
+                    continue
+                flag, method, rest = rest[0], rest[1], rest[2:]
+                parts = rest.split(b'\0', 2)
+                if len(parts) != 3:
+                    continue
+                value = parts[2]
+                if flag != 0:
+                    if method != 0:
+                        continue
+                    try:
+                        value = zlib.decompress(value)
+                    except zlib.error:
+                        continue
+                try:
+                    texts[key.decode('latin-1')] = value.decode('utf-8')
+                except UnicodeError:
+                    continue
+
+def _fast_sniff_png(image_path: str) -> Optional[str]:
+    """
+    PNG 텍스트 청크만으로 NAI/WebUI 프롬프트를 얻을 수 있으면 PIL 디코딩과 stealth 검사 없이 반환
+    (텍스트 청크에 프롬프트가 있는 PNG에는 NAI stealth 정보가 따로 없다고 가정)
+    얻지 못하면 None을 반환하여 기존 경로로 처리
+    """
+    try:
+        texts = _read_png_text_chunks(image_path)
+    except OSError:
+        return None
+    if not texts:
+        return None
+
+    # _get_infostr_from_img와 같은 우선순위: 'Comment' 다음 'parameters'
+    exif_str = texts.get('Comment', texts.get('parameters'))
+    nai_dict, _ = get_naidict_from_img(None, ImgMeta(exif_str=exif_str))
+    if isinstance(nai_dict, dict) and "prompt" in nai_dict:
+        return nai_dict["prompt"]
+    return None
+
+def read_info_from_image(image_path: str, raise_errors: bool = False) -> str:
+    # raise_errors가 True이면 읽기 오류를 빈 문자열 대신 예외로 전달 (프롬프트가 없는 이미지와 구분하기 위함)
+    # PNG는 앞부분 텍스트 청크에서 프롬프트를 찾으면 Image.open 없이 바로 반환
+    prompt = _fast_sniff_png(image_path)
+    if prompt is not None:
+        return prompt
+
     try:
         with Image.open(image_path) as img:
+            # EXIF/PNG 정보와 stealth pnginfo는 한 번만 읽고 아래 모든 방법에서 재사용
+            meta = _get_infostr_from_img(img)
+
             # NovelAI 이미지 정보 추출 시도
-            nai_dict, _ = get_naidict_from_img(img)
+            nai_dict, _ = get_naidict_from_img(img, meta)
             if nai_dict and "prompt" in nai_dict:
                 return nai_dict["prompt"]
 
@@ -340,43 +489,33 @@ def read_info_from_image(image_path: str) -> str:
             if comfyui_prompt:
                 return comfyui_prompt
 
-            # 방법 3: EXIF 데이터에서 프롬프트 정보 추출 (JPEG, WEBP 등)
-            if img.format in ["JPEG", "WEBP"]:
-                try:
-                    # piexif를 사용하여 EXIF 데이터 로드
-                    exif_data = piexif.load(img.info.get("exif"))
-                    if exif_data and "Exif" in exif_data:
-                        user_comment = exif_data["Exif"].get(piexif.ExifIFD.UserComment)
-                        if user_comment:
-                            # piexif.helper.UserComment.load를 사용하여 디코딩
-                            decoded_comment = piexif.helper.UserComment.load(user_comment)
-                            # image_data_reader.py에서처럼 JSON 파싱 시도 (Fooocus, Easy Diffusion 등)
-                            if decoded_comment.startswith("{") and decoded_comment.endswith("}"):
-                                try:
-                                    comment_json = json.loads(decoded_comment)
-                                    # Fooocus의 경우 "comment" 키에 프롬프트가 있을 수 있음
-                                    if "comment" in comment_json:
-                                        return comment_json["comment"]
-                                    # Easy Diffusion 등 다른 JSON 기반 프롬프트도 처리 가능
-                                    return decoded_comment
-                                except json.JSONDecodeError:
-                                    pass # JSON이 아니면 일반 텍스트로 처리
-                            return decoded_comment
-                except Exception as e:
-                    print(f"EXIF 데이터 읽기 오류: {str(e)}")
-                    pass # EXIF가 없거나 오류 발생 시 다음 방법 시도
-
-            # 방법 3: 기존 stealth pnginfo 읽기 (LSB 스테가노그래피)
-            stealth_info = read_info_from_image_stealth(img)
-            if stealth_info:
-                return stealth_info
+            # 방법 3: EXIF UserComment에서 프롬프트 정보 추출 (JPEG, WEBP 등)
+            decoded_comment = meta.user_comment
+            if decoded_comment is not None:
+                # image_data_reader.py에서처럼 JSON 파싱 시도 (Fooocus, Easy Diffusion 등)
+                if decoded_comment.startswith("{") and decoded_comment.endswith("}"):
+                    try:
+                        comment_json = json.loads(decoded_comment)
+                        # Fooocus의 경우 "comment" 키에 프롬프트가 있을 수 있음
+                        if "comment" in comment_json:
+                            return comment_json["comment"]
+                        # Easy Diffusion 등 다른 JSON 기반 프롬프트도 처리 가능
+                        return decoded_comment
+                    except json.JSONDecodeError:
+                        pass # JSON이 아니면 일반 텍스트로 처리
+                return decoded_comment
+
+            # 방법 4: 기존 stealth pnginfo 읽기 (LSB 스테가노그래피, 위에서 이미 읽은 값)
+            if meta.pnginfo_str:
+                return meta.pnginfo_str
 
         return ""
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"이미지 읽기 오류: {str(e)}")
         return ""
 
-
 def _extract_comfyui_prompt(image_info: dict) -> Optional[str]:
     try:
         prompt_json_str = image_info.get("prompt")
@@ -400,138 +539,116 @@ def _extract_comfyui_prompt(image_info: dict) -> Optional[str]:
             print(f"ComfyUI 파싱 후 프롬프트 데이터가 딕셔너리가 아님: {type(prompt_data)}") # 디버깅용
             return None
 
-        found_prompts = []
-
-        # 워크플로우의 노드들을 순회
-        for node_id, node_data in prompt_data.items():
-            class_type = node_data.get("class_type")
-            inputs = node_data.get("inputs")
-
-            # CLIPTextEncode 노드를 찾아 'text' 입력 추출
-            if class_type == "CLIPTextEncode" and inputs and "text" in inputs:
-                text = inputs["text"]
-                if isinstance(text, str):
-                    found_prompts.append(text)
-
+        # CLIPTextEncode 노드의 'text' 입력만 골라 바로 이어 붙임 (노드 id는 쓰지 않으므로 values()로 순회)
+        found_prompts = "\n".join(
+            node_data["inputs"]["text"]
+            for node_data in prompt_data.values()
+            if node_data.get("class_type") == "CLIPTextEncode"
+            and isinstance((node_data.get("inputs") or {}).get("text"), str)
+        )
         if found_prompts:
-            return "\n".join(found_prompts)
+            return found_prompts
 
     except Exception as e: # 예상치 못한 다른 오류를 잡기 위함
         print(f"ComfyUI 프롬프트 추출 중 예상치 못한 오류: {e}") # 디버깅용
         return None
     return None
 
+def _stealth_scan(bits_a, bits_rgb) -> Tuple[Optional[str], bool, int, int]:
+    """
+    LSB 비트열에서 stealth 서명과 길이 필드를 찾아
+    (mode, compressed, payload 시작 인덱스, payload 비트 길이)를 반환
+    """
+    sig_len = len('stealth_pnginfo') * 8
+    # 서명 뒤 32비트는 페이로드 길이(비트 단위), 그 뒤가 페이로드
+    cursor = sig_len + 32
+    # RGB 서명(40픽셀)이 알파 서명(120픽셀)보다 먼저 완성되므로 RGB를 먼저 확인
+    candidates = [('rgb', bits_rgb)]
+    if bits_a is not None:
+        candidates.append(('alpha', bits_a))
+
+    for mode, bits in candidates:
+        if len(bits) < sig_len:
+            continue
+        # 헤더(서명 15바이트 + 길이 4바이트)는 바이트 경계에 맞으므로 한 번에 묶어서 해석
+        header = np.packbits(bits[:cursor]).tobytes()
+        sig_mode, compressed = _STEALTH_SIGNATURES.get(header[:sig_len // 8], (None, False))
+        if sig_mode != mode:
+            continue
+        if len(bits) < cursor:
+            break
+        param_len = int.from_bytes(header[sig_len // 8:], 'big')
+        return mode, compressed, cursor, param_len
+
+    return None, False, 0, 0
+
+def _gunzip(data: bytes) -> bytes:
+    """
+    gzip 스트림을 GzipFile/BytesIO 래퍼 없이 zlib 한 번 호출로 해제 (잘린 스트림은 zlib.error)
+    """
+    return zlib.decompress(data, wbits=16 + zlib.MAX_WBITS)
+
+def _decode_binary_data(bits, compressed: bool) -> str:
+    """
+    stealth 페이로드 비트 배열(값이 0/1인 uint8)을 바이트로 묶어 문자열로 디코딩
+    """
+    byte_data = np.packbits(bits).tobytes()
+    if compressed:
+        return _gunzip(byte_data).decode('utf-8')
+    return byte_data.decode('utf-8', errors='ignore')
+
+def _extract_lsb(image: Image.Image, channel: str, n_pixels):
+    """
+    순회 순서(x 바깥, y 안쪽)상 앞쪽 n_pixels개 픽셀을 덮는 열들의 LSB를 추출
+    channel이 'A'이면 알파 채널, 'RGB'이면 픽셀마다 R, G, B 순서의 비트를 반환
+    """
+    width, height = image.size
+    n_cols = min(width, -(-n_pixels // height))
+    # 필요한 열만 잘라 원시 바이트로 복사하여 서명 확인 시 전체 이미지 크기의 NumPy 배열을 만들지 않음
+    # (crop()은 내부에서 load()를 호출하므로 픽셀 디코딩은 이미지 전체에 대해 한 번 일어남. 줄어드는 것은 복사량뿐)
+    region = image if n_cols == width else image.crop((0, 0, n_cols, height))
+    if channel == 'A':
+        # 알파 채널만 단일 밴드로 가져와 픽셀당 1바이트만 복사
+        arr = np.frombuffer(region.getchannel('A').tobytes(), dtype=np.uint8).reshape(height, n_cols)
+        # 원본 구현과 같은 순회 순서가 되도록 전치
+        src = arr.T
+    else:
+        arr = np.frombuffer(region.tobytes(), dtype=np.uint8).reshape(height, n_cols, len(image.mode))
+        src = arr.transpose(1, 0, 2)[..., :3]
+    # 미리 할당한 C 순서 버퍼에 바로 기록하여 임시 배열 생성과 재복사를 피함
+    bits = np.empty(src.shape, dtype=np.uint8)
+    np.bitwise_and(src, 1, out=bits)
+    return bits.reshape(-1)
+
 def read_info_from_image_stealth(image: Image.Image) -> Optional[str]:
     # from https://github.com/neggles/sd-webui-stealth-pnginfo/
     """
     이미지에서 stealth pnginfo를 추출
     """
-    width, height = image.size
-    pixels = image.load()
-
-    has_alpha = True if image.mode == 'RGBA' else False
-    mode = None
-    compressed = False
-    binary_data = ''
-    buffer_a = ''
-    buffer_rgb = ''
-    index_a = 0
-    index_rgb = 0
-    sig_confirmed = False
-    confirming_signature = True
-    reading_param_len = False
-    reading_param = False
-    read_end = False
-    for x in range(width):
-        for y in range(height):
-            if has_alpha:
-                r, g, b, a = pixels[x, y]
-                buffer_a += str(a & 1)
-                index_a += 1
-            else:
-                r, g, b = pixels[x, y]
-            buffer_rgb += str(r & 1)
-            buffer_rgb += str(g & 1)
-            buffer_rgb += str(b & 1)
-            index_rgb += 3
-            if confirming_signature:
-                if index_a == len('stealth_pnginfo') * 8:
-                    decoded_sig = bytearray(int(buffer_a[i:i + 8], 2) for i in
-                                            range(0, len(buffer_a), 8)).decode('utf-8', errors='ignore')
-                    if decoded_sig in {'stealth_pnginfo', 'stealth_pngcomp'}:
-                        confirming_signature = False
-                        sig_confirmed = True
-                        reading_param_len = True
-                        mode = 'alpha'
-                        if decoded_sig == 'stealth_pngcomp':
-                            compressed = True
-                        buffer_a = ''
-                        index_a = 0
-                    else:
-                        read_end = True
-                        break
-                elif index_rgb == len('stealth_pnginfo') * 8:
-                    decoded_sig = bytearray(int(buffer_rgb[i:i + 8], 2) for i in
-                                            range(0, len(buffer_rgb), 8)).decode('utf-8', errors='ignore')
-                    if decoded_sig in {'stealth_rgbinfo', 'stealth_rgbcomp'}:
-                        confirming_signature = False
-                        sig_confirmed = True
-                        reading_param_len = True
-                        mode = 'rgb'
-                        if decoded_sig == 'stealth_rgbcomp':
-                            compressed = True
-                        buffer_rgb = ''
-                        index_rgb = 0
-            elif reading_param_len:
-                if mode == 'alpha':
-                    if index_a == 32:
-                        param_len = int(buffer_a, 2)
-                        reading_param_len = False
-                        reading_param = True
-                        buffer_a = ''
-                        index_a = 0
-                else:
-                    if index_rgb == 33:
-                        pop = buffer_rgb[-1]
-                        buffer_rgb = buffer_rgb[:-1]
-                        param_len = int(buffer_rgb, 2)
-                        reading_param_len = False
-                        reading_param = True
-                        buffer_rgb = pop
-                        index_rgb = 1
-            elif reading_param:
-                if mode == 'alpha':
-                    if index_a == param_len:
-                        binary_data = buffer_a
-                        read_end = True
-                        break
-                else:
-                    if index_rgb >= param_len:
-                        diff = param_len - index_rgb
-                        if diff < 0:
-                            buffer_rgb = buffer_rgb[:diff]
-                        binary_data = buffer_rgb
-                        read_end = True
-                        break
-            else:
-                # impossible
-                read_end = True
-                break
-        if read_end:
-            break
-    if sig_confirmed and binary_data != '':
-        # Convert binary string to UTF-8 encoded text
-        byte_data = bytearray(int(binary_data[i:i + 8], 2)
-                              for i in range(0, len(binary_data), 8))
-        try:
-            if compressed:
-                decoded_data = gzip.decompress(
-                    bytes(byte_data)).decode('utf-8')
-            else:
-                decoded_data = byte_data.decode('utf-8', errors='ignore')
-            return decoded_data
-        except Exception as e:
-            print(e)
-            pass
+    if image.mode not in ('RGB', 'RGBA') or 0 in image.size:
+        return None
+    has_alpha = image.mode == 'RGBA'
+
+    # 서명과 길이 필드를 덮는 열의 LSB만 먼저 추출하고, 서명이 없으면 페이로드 추출 없이 종료
+    # (이미지 디코딩 자체는 첫 추출에서 전체에 대해 일어나므로 stealth 검사는 픽셀 디코딩 비용을 그대로 치름)
+    header_len = len('stealth_pnginfo') * 8 + 32
+    bits_rgb = _extract_lsb(image, 'RGB', -(-header_len // 3))
+    bits_a = _extract_lsb(image, 'A', header_len) if has_alpha else None
+    mode, compressed, start, param_len = _stealth_scan(bits_a, bits_rgb)
+    if mode is None:
+        return None
+
+    payload_end = start + param_len
+    if mode == 'alpha':
+        bits = _extract_lsb(image, 'A', payload_end)
+    else:
+        bits = _extract_lsb(image, 'RGB', -(-payload_end // 3))
+    if param_len == 0 or len(bits) < payload_end:
+        return None
+
+    try:
+        return _decode_binary_data(bits[start:payload_end], compressed)
+    except Exception as e:
+        print(e)
 
-    return None
\ No newline at end of file
+    return None
@@ -1,16 +1,56 @@
 import sys
 import os
+import errno
+import functools
 import shutil
 import gzip
+import json
+import tempfile
+import threading
 import time
+import weakref
 import concurrent.futures
+from collections import deque
 from PyQt5.QtWidgets import (QComboBox, QInputDialog, QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QLabel, QLineEdit, QCheckBox, QPushButton, QFileDialog, QProgressBar,
-                            QMessageBox, QTextEdit, QSpinBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                            QMessageBox, QPlainTextEdit, QSpinBox)
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PIL import Image
-from settings_manager import SettingsManager
-from image_utils import read_info_from_image
+from settings_manager import SettingsManager, PROMPT_CACHE_MAX_ENTRIES
+from image_utils import read_info_from_image, PROMPT_EXTRACTOR_VERSION
+
+try:
+    # 선택적 의존성: 키워드가 많을 때 모든 키워드를 프롬프트 한 번 스캔으로 매칭
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# 작업 로그는 이 줄 수 또는 시간(초)마다 묶어서 전송
+LOG_FLUSH_LINES = 32
+LOG_FLUSH_INTERVAL = 0.05
+
+# 풀 작업자 한 명당 결과를 기다리지 않고 미리 제출해 둘 읽기 작업 수
+SUBMIT_AHEAD_PER_WORKER = 4
+
+# 멀티코어 설정이어도 한 레벨의 읽기 작업이 이보다 적으면 프로세스 대신 스레드 풀 사용
+PROCESS_POOL_MIN_TASKS = 64
+
+# 읽기 작업 목록을 만드는 동안 이 파일 수마다 취소 여부를 확인
+JOB_BUILD_CANCEL_CHECK = 256
+
+# 디스크 프롬프트 캐시에 기록할 프롬프트의 최대 길이 (더 긴 프롬프트는 매번 다시 읽음)
+DISK_CACHE_MAX_PROMPT_CHARS = 8192
+
+# 분류 대상 이미지 확장자
+IMAGE_EXTS = frozenset({'.png', '.jpg', '.jpeg', '.webp'})
+
+def is_image_filename(name: str) -> bool:
+    """
+    파일 이름 전체 대신 확장자 부분만 소문자로 바꿔 집합에서 조회합니다.
+    점이 없는 이름은 확장자가 없으므로 이미지가 아닙니다.
+    """
+    i = name.rfind('.')
+    return i >= 0 and name[i:].lower() in IMAGE_EXTS
 
 def sanitize_for_path(name: str) -> str:
     """
@@ -22,33 +62,182 @@ def sanitize_for_path(name: str) -> str:
         sanitized = sanitized.replace(char, '_')
     return sanitized
 
+def move_file(src, dst):
+    """
+    같은 드라이브면 os.replace 한 번으로 이동하고, 드라이브가 다르면 shutil.move로 복사 후 삭제합니다.
+    """
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+def reserve_numbered_path(directory, base, ext, start=1):
+    """
+    '이름 (01).확장자', '이름 (02).확장자' ... 중 start번부터 아직 없는 이름을 빈 파일로 만들어 선점하고
+    (경로, 번호)를 반환합니다.
+    O_CREAT|O_EXCL로 확인과 생성을 한 번에 하므로 확인 후 다른 곳에서 같은 이름을 만드는 경쟁이 없습니다.
+    """
+    counter = start
+    while True:
+        path = os.path.join(directory, f"{base} ({counter:02d}){ext}")
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            counter += 1
+            continue
+        os.close(fd)
+        return path, counter
+
+# 키워드가 적을 때는 str의 in 검색이 더 빠르므로 이 개수 이상일 때만 Aho-Corasick 사용
+_AHOCORASICK_MIN_KEYWORDS = 8
+@functools.lru_cache(maxsize=64)
+def _get_keyword_automaton(lowered_keywords):
+    """
+    레벨 키워드 목록(튜플)으로 만든 Aho-Corasick 오토마톤을 반환합니다.
+    프리셋/레벨이 반복되면 프로세스마다 캐시된 오토마톤을 재사용합니다.
+    """
+    automaton = ahocorasick.Automaton()
+    for index, (original, lowered) in enumerate(lowered_keywords):
+        # 같은 키워드가 중복되면 앞의 것이 우선
+        if lowered not in automaton:
+            automaton.add_word(lowered, (index, original))
+    automaton.make_automaton()
+    return automaton
+
+def _find_matching_keyword(prompt_data, lowered_keywords):
+    """
+    프롬프트에 포함된 첫 번째 키워드를 반환합니다. 없으면 None.
+    lowered_keywords는 (원래 키워드, 소문자 키워드) 튜플이며, 프롬프트는 한 번만 소문자로 변환합니다.
+    """
+    hay = prompt_data.lower()
+    if ahocorasick is not None and len(lowered_keywords) >= _AHOCORASICK_MIN_KEYWORDS:
+        # 프롬프트 안의 위치가 아니라 키워드 목록 순서가 우선순위이므로 가장 앞선 키워드를 선택
+        best = None
+        for _, (index, original) in _get_keyword_automaton(lowered_keywords).iter(hay):
+            if best is None or index < best[0]:
+                best = (index, original)
+                if index == 0:
+                    break
+        return best[1] if best else None
+
+    for original, lowered in lowered_keywords:
+        if lowered in hay:
+            return original
+    return None
+
+def classify_prompt(image_path, prompt_data, file_size, lowered_keywords):
+    """
+    추출된 프롬프트로 키워드 분류 결과를 만듭니다.
+    캐시된 프롬프트를 다시 분류할 때도 같은 결과 형식을 사용합니다.
+    """
+    img_file = os.path.basename(image_path)
+    if not prompt_data:
+        return {"status": "no_prompt", "path": image_path, "log": f"{img_file}: 프롬프트 데이터 없음"}
+
+    if not lowered_keywords:
+        return {"status": "no_keyword_match", "path": image_path, "prompt": prompt_data, "size": file_size}
+
+    keyword = _find_matching_keyword(prompt_data, lowered_keywords)
+    if keyword is not None:
+        return {"status": "success", "path": image_path, "keyword": keyword, "prompt": prompt_data, "size": file_size}
+
+    return {"status": "no_keyword_match", "path": image_path, "prompt": prompt_data, "size": file_size, "log": f"{img_file}: 일치하는 키워드 없음"}
+
 # 멀티프로세싱을 위한 최상위 레벨 함수
-def process_single_image_task(image_path, keywords):
+def process_single_image_task(image_path, lowered_keywords, file_size=None):
     """
     단일 이미지 파일을 처리하는 작업 함수 (CPU 바운드 작업).
     멀티프로세싱 워커에 의해 실행됩니다.
     """
     img_file = os.path.basename(image_path)
     try:
-        # 파일 크기 가져오기
-        file_size = os.path.getsize(image_path)
-        prompt_data = read_info_from_image(image_path)
-        if not prompt_data:
-            return {"status": "no_prompt", "path": image_path, "log": f"{img_file}: 프롬프트 데이터 없음"}
-
-        if not keywords:
-            return {"status": "no_keyword_match", "path": image_path, "prompt": prompt_data, "size": file_size}
-
-        for keyword in keywords:
-            if keyword.lower() in prompt_data.lower():
-                return {"status": "success", "path": image_path, "keyword": keyword, "prompt": prompt_data, "size": file_size}
-
-        return {"status": "no_keyword_match", "path": image_path, "prompt": prompt_data, "size": file_size, "log": f"{img_file}: 일치하는 키워드 없음"}
+        # 파일 크기 가져오기 (호출 측에서 이미 stat한 경우 그 값을 사용)
+        if file_size is None:
+            file_size = os.path.getsize(image_path)
+        try:
+            prompt_data = read_info_from_image(image_path, raise_errors=True)
+        except Exception as e:
+            # 기존과 같이 프롬프트 없음으로 분류하되, 일시적인 오류일 수 있으므로 캐시하지 않도록 표시
+            print(f"이미지 읽기 오류: {str(e)}")
+            result = classify_prompt(image_path, "", file_size, lowered_keywords)
+            result["read_failed"] = True
+            return result
+        return classify_prompt(image_path, prompt_data, file_size, lowered_keywords)
     except FileNotFoundError:
         return {"status": "error", "path": image_path, "log": f"{img_file} 파일을 찾을 수 없습니다."}
     except Exception as e:
         return {"status": "error", "path": image_path, "log": f"{img_file} 처리 중 오류 발생: {str(e)}"}
 
+def _run_inline(fn, *args):
+    """
+    풀 없이 현재 스레드에서 바로 실행하고, 결과를 담은 완료된 Future를 반환합니다. (executor.submit 대용)
+    """
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _discard_journal_file(state):
+    if state['file'] is not None:
+        state['file'].close()
+        state['file'] = None
+    try:
+        os.remove(state['path'])
+    except OSError:
+        pass
+
+class UndoJournal:
+    """
+    실행 취소 기록을 gzip 임시 파일에 JSON 한 줄씩 기록합니다.
+    대량 작업에서도 메모리 사용량이 일정하며, 실행 취소할 때만 파일을 다시 읽습니다.
+    """
+    def __init__(self):
+        self._state = None
+        self._count = 0
+        self._finalizer = None
+
+    def append(self, entry):
+        if self._state is None:
+            fd, path = tempfile.mkstemp(prefix='prompt_classifier_undo_', suffix='.jsonl.gz')
+            os.close(fd)
+            self._state = {'path': path, 'file': None}
+            # 워커가 정리되거나 프로그램이 종료되면 임시 파일을 닫고 삭제
+            self._finalizer = weakref.finalize(self, _discard_journal_file, self._state)
+        if self._state['file'] is None:
+            # 이미 읽은 뒤 다시 기록하면 새 gzip 멤버로 이어 붙임 (읽을 때는 하나로 이어짐)
+            self._state['file'] = gzip.open(self._state['path'], 'at', encoding='utf-8')
+        self._state['file'].write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        if not self._count:
+            return iter(())
+        if self._state['file'] is not None:
+            self._state['file'].close()
+            self._state['file'] = None
+        with gzip.open(self._state['path'], 'rt', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        return iter(entries)
+
+    def __reversed__(self):
+        entries = list(self)
+        entries.reverse()
+        return iter(entries)
+
+    def clear(self):
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._state = None
+        self._count = 0
 
 class ImageClassifierWorker(QThread):
     progress_updated = pyqtSignal(int)
@@ -59,7 +248,7 @@ class ImageClassifierWorker(QThread):
     def __init__(self, source_dir, prompt_levels, rename_images=False, handle_others=False, resolve_conflicts=False,
                  multicore_enabled=False, multicore_core_count=4,
                  full_tracking_enabled=False, full_tracking_prompt="", custom_dest_enabled=False, custom_dest_path="",
-                 safe_mode_enabled=False, clone_mode_enabled=False):
+                 safe_mode_enabled=False, clone_mode_enabled=False, settings_manager=None):
         super().__init__()
         self.source_dir = source_dir
         self.prompt_levels = prompt_levels
@@ -74,33 +263,99 @@ class ImageClassifierWorker(QThread):
         self.custom_dest_path = custom_dest_path
         self.safe_mode_enabled = safe_mode_enabled
         self.clone_mode_enabled = clone_mode_enabled
-        self.canceled = False
+        # 디스크 프롬프트 캐시를 읽고 쓰는 데 사용 (None이면 디스크 캐시 사용 안 함)
+        self.settings_manager = settings_manager
+        # GUI 스레드에서 설정하는 취소 플래그 (스레드 간 공유이므로 Event 사용)
+        self._cancel_event = threading.Event()
 
-        self.undo_info = []
+        self.undo_info = UndoJournal()
         self.created_dirs = []
+        # 처리한 파일 목록은 안전 모드의 원본 삭제/보존/취소에만 필요하므로 안전 모드에서만 보관하고, 그 외에는 개수만 셈
+        # (실행 취소 기록은 undo_info 저널에 디스크로 기록됨)
         self.processed_files_info = []
+        self.processed_count = 0
+        # 로그는 모아서 한 번에 보내 스레드 간 시그널과 로그 창 갱신 횟수를 줄임
+        self._log_buffer = []
+        self._last_log_flush = time.monotonic()
+        # 이번 작업에서 이미 존재를 확인한 대상 폴더 (파일마다 폴더 존재 여부를 다시 확인하지 않음)
+        self._known_dirs = set()
+        # (대상 폴더, 이름, 확장자) -> 다음에 시도할 충돌 번호. 같은 이름이 계속 충돌해도 (01)부터 다시 확인하지 않음
+        self._conflict_next = {}
+        # (경로, mtime_ns, 크기) -> 프롬프트. 이번 레벨에서 이동/복사한 파일만 담아 다음 레벨에서 다시 읽지 않도록 함
+        # (레벨마다 새로 만들어 바로 다음 레벨에서 쓸 항목만 유지하므로 메모리는 한 레벨 분량으로 제한됨)
+        self._prompt_cache = {}
+        # 모든 레벨이 함께 쓰는 읽기용 풀 {프로세스 풀 여부: (풀, 작업자 수)} (처음 사용할 때 생성, 작업이 끝나면 종료)
+        self._executors = {}
+        # 경로 -> [mtime_ns, 크기, 프롬프트]. 이전 실행들에서 읽은 프롬프트로, 작업 중에만 로드해 둠
+        self._disk_cache = None
+        # 이번 실행에서 디스크 캐시 내용이 바뀌었는지 여부 (바뀌지 않았으면 다시 저장하지 않음)
+        self._disk_cache_dirty = False
+        # 이번 실행에서 조회되거나 기록된 디스크 캐시 경로 (용량이 찼을 때 버리지 않을 항목)
+        self._disk_cache_used = set()
 
     def run(self):
-        self.undo_info = []
+        self._disk_cache = {}
+        self._disk_cache_dirty = False
+        self._disk_cache_used = set()
+        try:
+            # 다시 실행해도 같은 파일의 프롬프트를 다시 읽지 않도록 이전 실행의 캐시를 사용
+            # (캐시를 읽지 못해도 분류와 종료 시그널은 그대로 진행)
+            if self.settings_manager is not None:
+                try:
+                    self._disk_cache = self.settings_manager.load_prompt_cache(PROMPT_EXTRACTOR_VERSION)
+                except Exception as e:
+                    self._log(f"프롬프트 캐시를 불러오지 못해 사용하지 않습니다: {e}")
+            self._run()
+        finally:
+            self._release_resources()
+
+    def _release_resources(self):
+        """
+        읽기용 풀을 종료하고, 바뀐 내용이 있으면 프롬프트 캐시를 저장합니다. (여러 번 호출해도 한 번만 수행)
+        """
+        self._shutdown_executors()
+        if self._disk_cache_dirty and self.settings_manager is not None:
+            self.settings_manager.save_prompt_cache(self._disk_cache, PROMPT_EXTRACTOR_VERSION)
+        self._disk_cache = None
+        self._disk_cache_dirty = False
+        self._disk_cache_used = set()
+
+    def _finish(self, signal, *args):
+        """
+        정리를 모두 마친 뒤 남은 로그와 종료 시그널을 보냅니다.
+        시그널을 받은 화면이 곧바로 새 작업을 시작할 수 있으므로 시그널 이후에는 남은 작업이 없어야 합니다.
+        """
+        self._release_resources()
+        self._flush_log()
+        signal.emit(*args)
+
+    def _run(self):
+        self.undo_info.clear()
         self.created_dirs = []
         self.processed_files_info = []
+        self.processed_count = 0
+        self._known_dirs = set()
+        self._conflict_next = {}
 
         operation_type = 'copy' if self.safe_mode_enabled or self.clone_mode_enabled else 'move'
 
         if self.full_tracking_enabled:
-            self.log_updated.emit("전체추적 모드 활성화: 모든 하위 폴더의 이미지를 검색합니다.")
+            self._log("전체추적 모드 활성화: 모든 하위 폴더의 이미지를 검색합니다.")
+            # 큰 폴더는 탐색이 오래 걸리므로 시작 메시지를 바로 표시
+            self._flush_log()
             image_files_with_paths = self._find_all_image_files_recursive(self.source_dir)
-            if not image_files_with_paths:
-                self.log_updated.emit("이미지 파일을 찾을 수 없습니다.")
-                self.completed.emit(0)
+            # 탐색 중 취소된 경우에는 아래 취소 처리로 넘어감
+            if not image_files_with_paths and not self.canceled:
+                self._log("이미지 파일을 찾을 수 없습니다.")
+                self._finish(self.completed, 0)
                 return
 
-            self.log_updated.emit(f"{len(image_files_with_paths)}개의 이미지를 찾았습니다. 전체추적 분류를 시작합니다...")
+            self._log(f"{len(image_files_with_paths)}개의 이미지를 찾았습니다. 전체추적 분류를 시작합니다...")
 
             prompt_keywords = [p.strip() for p in self.full_tracking_prompt.split('|') if p.strip()]
             if not prompt_keywords and not self.handle_others:
-                self.log_updated.emit("전체추적 프롬프트가 비어있거나 '그 외 처리'가 비활성화되어 작업을 중단합니다.")
-                self.completed.emit(0)
+                self._log("전체추적 프롬프트가 비어있거나 '그 외 처리'가 비활성화되어 작업을 중단합니다.")
+                self._finish(self.completed, 0)
                 return
 
             self._process_images_by_keywords(image_files_with_paths, prompt_keywords, operation_type)
@@ -114,11 +369,13 @@ class ImageClassifierWorker(QThread):
                     else:
                         continue
 
-                self.log_updated.emit(f"레벨 {level_idx+1} 처리 중 - 프롬프트: {prompt_string}")
+                self._log(f"레벨 {level_idx+1} 처리 중 - 프롬프트: {prompt_string}")
+                # 큰 폴더는 탐색이 오래 걸리므로 시작 메시지를 바로 표시
+                self._flush_log()
                 level_images = self._collect_level_images(current_dirs)
 
                 if not level_images:
-                    self.log_updated.emit("처리할 이미지가 없습니다.")
+                    self._log("처리할 이미지가 없습니다.")
                     break
 
                 prompt_keywords = [p.strip() for p in prompt_string.split('|') if p.strip()]
@@ -127,91 +384,230 @@ class ImageClassifierWorker(QThread):
                 if next_dirs:
                     current_dirs = next_dirs
                 else:
-                    self.log_updated.emit("더 이상 처리할 디렉토리가 없습니다.")
+                    self._log("더 이상 처리할 디렉토리가 없습니다.")
                     break
 
         if self.canceled:
-            self.log_updated.emit("작업이 취소되었습니다.")
-            self.completed.emit(0)
+            self._log("작업이 취소되었습니다.")
+            self._finish(self.completed, 0)
             return
 
         if self.safe_mode_enabled:
             total_size_mb = sum(info['size'] for info in self.processed_files_info) / (1024 * 1024) if self.processed_files_info else 0.0
-            self.safe_mode_dialog_required.emit(len(self.processed_files_info), total_size_mb)
+            self._finish(self.safe_mode_dialog_required, self.processed_count, total_size_mb)
         else:
-            self.completed.emit(len(self.processed_files_info))
+            self._finish(self.completed, self.processed_count)
+
+    def _get_executor(self, use_processes):
+        """
+        작업 전체에서 공유하는 읽기용 풀과 작업자 수를 반환합니다.
+        레벨마다 풀(프로세스)을 새로 띄우지 않도록 종류별로 처음 사용할 때 한 번만 생성합니다.
+        """
+        pool = self._executors.get(use_processes)
+        if pool is None:
+            if use_processes:
+                max_workers = self.multicore_core_count
+                pool = (concurrent.futures.ProcessPoolExecutor(max_workers=max_workers), max_workers)
+            else:
+                # 스레드 풀로 읽기 (Pillow/zlib/NumPy가 GIL을 해제하므로 디스크 I/O와 디코딩이 겹침)
+                # 파일 이동/복사는 작업 스레드가 순서대로 처리
+                max_workers = min(32, (os.cpu_count() or 1) * 2)
+                pool = (concurrent.futures.ThreadPoolExecutor(max_workers=max_workers), max_workers)
+            self._executors[use_processes] = pool
+        return pool
+
+    def _shutdown_executors(self):
+        for executor, _ in self._executors.values():
+            # 취소된 경우 아직 시작하지 않은 작업은 버림
+            executor.shutdown(wait=True, cancel_futures=self.canceled)
+        self._executors.clear()
+
+    def _log(self, message):
+        self._log_buffer.append(message)
+        if len(self._log_buffer) >= LOG_FLUSH_LINES or time.monotonic() - self._last_log_flush >= LOG_FLUSH_INTERVAL:
+            self._flush_log()
+
+    def _flush_log(self):
+        if self._log_buffer:
+            self.log_updated.emit("\n".join(self._log_buffer))
+            self._log_buffer.clear()
+        self._last_log_flush = time.monotonic()
 
     def _collect_level_images(self, directories):
         level_images = []
         for directory in directories:
-            for file in os.listdir(directory):
-                file_path = os.path.join(directory, file)
-                if file.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')) and os.path.isfile(file_path):
-                    level_images.append((directory, file))
+            # scandir의 DirEntry는 파일 종류를 캐시하므로 항목마다 isfile stat 호출이 필요 없음
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if is_image_filename(entry.name) and entry.is_file():
+                        level_images.append((directory, entry.name, entry))
         return level_images
 
     def _find_all_image_files_recursive(self, directory):
-        image_files_with_paths = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
-                    image_files_with_paths.append((root, file))
-        return image_files_with_paths
+        return list(self._iter_image_files(directory))
+
+    def _iter_image_files(self, directory):
+        """
+        os.walk와 같은 순서(현재 폴더의 파일 먼저, 이후 하위 폴더)로 이미지 파일을 (폴더, 파일 이름, DirEntry)로 하나씩 반환합니다.
+        os.walk처럼 심볼릭 링크 폴더는 따라가지 않고, 열 수 없는 폴더는 건너뜁니다.
+        재귀 대신 명시적 스택을 사용하며, 작업이 취소되면 탐색을 중단합니다.
+        """
+        is_canceled = self._cancel_event.is_set
+        stack = deque([directory])
+        while stack:
+            if is_canceled():
+                return
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+
+            subdirs = []
+            for entry in entries:
+                # 항목을 확인하는 중 삭제되었거나 접근할 수 없는 경우 폴더가 아닌 것으로 취급
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                elif is_image_filename(entry.name):
+                    yield (current, entry.name, entry)
+
+            # 스택이므로 역순으로 넣어야 첫 번째 하위 폴더부터 탐색
+            stack.extend(reversed(subdirs))
 
     def _process_images_by_keywords(self, images, keywords, operation_type):
         total_images = len(images)
         processed_count = 0
-        next_dirs = []
+        last_progress = -1
+        next_dirs = {}  # 순서를 유지하는 집합으로 사용 (중복 확인 O(1))
         unmatched_images = []
         keyword_counters = {keyword: 0 for keyword in keywords}
 
-        image_paths = [os.path.join(img_dir, img_file) for img_dir, img_file in images]
-
-        with concurrent.futures.ProcessPoolExecutor(max_workers=self.multicore_core_count if self.multicore_enabled else 1) as executor:
-            future_to_path = {executor.submit(process_single_image_task, path, keywords): path for path in image_paths}
-
-            for future in concurrent.futures.as_completed(future_to_path):
-                if self.canceled:
+        # 키워드 소문자 변환은 파일마다 하지 않고 레벨마다 한 번만 수행
+        lowered_keywords = tuple((keyword, keyword.lower()) for keyword in keywords)
+
+        # 이전 레벨에서 읽은 파일은 캐시된 프롬프트로 바로 분류하고, 나머지만 풀에서 읽음
+        # 작업 종류: 'task'(풀에서 읽기), 'cached'(캐시된 프롬프트)
+        jobs = []
+        # 이전 레벨이 남긴 캐시는 이번 레벨에서 조회만 하고, 새 캐시에는 이번 레벨의 이동/복사 결과만 기록
+        prompt_cache, self._prompt_cache = self._prompt_cache, {}
+        # 이번 레벨에서 옮기지 않은 파일은 이전 실행에서 기록한 디스크 캐시에서 찾음 (수정 시각과 크기가 같을 때만)
+        disk_cache = self._disk_cache
+        for job_index, (img_dir, img_file, entry) in enumerate(images):
+            # 큰 폴더에서는 파일마다 stat이 필요해 목록 작성이 오래 걸리므로 중간에 취소를 확인
+            if job_index % JOB_BUILD_CANCEL_CHECK == 0 and self._cancel_event.is_set():
+                return []
+            # 경로와 stat은 탐색 때 얻은 DirEntry에서 가져옴 (Windows에서는 디렉터리 목록에 포함된 정보라 추가 stat 호출 없음)
+            path = entry.path
+            try:
+                st = entry.stat()
+            except OSError:
+                st = None
+            if st is None:
+                jobs.append((img_dir, img_file, path, 'task', (path, lowered_keywords), None))
+                continue
+            cached_prompt = prompt_cache.get((path, st.st_mtime_ns, st.st_size))
+            if cached_prompt is None:
+                disk_entry = disk_cache.get(path)
+                if disk_entry is not None and disk_entry[0] == st.st_mtime_ns and disk_entry[1] == st.st_size:
+                    cached_prompt = disk_entry[2]
+                    # 이번 실행에서 쓴 항목은 최근 항목으로 옮겨 용량이 찰 때 버려지지 않게 함
+                    disk_cache[path] = disk_cache.pop(path)
+                    self._disk_cache_used.add(path)
+            if cached_prompt is not None:
+                jobs.append((img_dir, img_file, path, 'cached', (cached_prompt, st.st_size), st))
+                continue
+            jobs.append((img_dir, img_file, path, 'task', (path, lowered_keywords, st.st_size), st))
+        del prompt_cache
+
+        task_count = sum(1 for job in jobs if job[3] == 'task')
+        if task_count < 2:
+            # 나눠 읽을 작업이 없으면 풀을 만들거나 깨우지 않고 이 스레드에서 차례로 읽음
+            executor = None
+            submit = _run_inline
+            window = 0
+        else:
+            # 프로세스 생성 비용이 읽기 시간보다 커지는 작은 레벨은 멀티코어 설정이어도 스레드 풀로 읽음
+            use_processes = self.multicore_enabled and task_count >= PROCESS_POOL_MIN_TASKS
+            executor, max_workers = self._get_executor(use_processes)
+            submit = executor.submit
+            # 읽기 작업은 처리 위치보다 이만큼까지만 앞서 제출 (결과가 쌓여 메모리가 늘어나지 않도록 제한)
+            window = max_workers * SUBMIT_AHEAD_PER_WORKER
+
+        futures = {}
+        next_submit = 0
+
+        # 제출 순서대로 결과를 받아 이름 변경 번호가 파일 목록 순서를 따르도록 유지
+        # 반복문 안에서 쓰는 메서드/속성은 지역 변수로 한 번만 조회
+        is_canceled = self._cancel_event.is_set
+        log = self._log
+        process_image_file = self._process_image_file
+        emit_progress = self.progress_updated.emit
+        add_unmatched = unmatched_images.append
+        remember_prompt = self._remember_prompt
+        for index, (img_dir, img_file, path, kind, payload, st) in enumerate(jobs):
+            while next_submit < len(jobs) and next_submit <= index + window:
+                if jobs[next_submit][3] == 'task':
+                    futures[next_submit] = submit(process_single_image_task, *jobs[next_submit][4])
+                next_submit += 1
+
+            if is_canceled():
+                if executor is not None:
                     executor.shutdown(wait=False, cancel_futures=True)
-                    return []
+                return []
 
-                try:
-                    result = future.result()
-                    if result.get('log'):
-                        self.log_updated.emit(result['log'])
-
-                    img_path = result["path"]
-                    img_dir = os.path.dirname(img_path)
-                    img_file = os.path.basename(img_path)
-
-                    if result["status"] == "success":
-                        matched_keyword = result["keyword"]
-                        file_size = result.get("size", 0)
-                        keyword_dir = self._process_image_file(img_dir, img_file, img_path, file_size, matched_keyword, keyword_counters, operation_type)
-                        if keyword_dir and keyword_dir not in next_dirs:
-                            next_dirs.append(keyword_dir)
-                    elif result["status"] in ["no_keyword_match", "no_prompt"]:
-                        unmatched_images.append((img_dir, img_file, img_path, result.get("size", 0)))
+            try:
+                if kind == 'task':
+                    result = futures.pop(index).result()
+                else:
+                    cached_prompt, file_size = payload
+                    result = classify_prompt(path, cached_prompt, file_size, lowered_keywords)
+                if result.get('log'):
+                    log(result['log'])
+
+                img_path = result["path"]
+                prompt_data = result.get("prompt", "")
+                # 프롬프트가 없다는 결과도 기록하여 다음 실행에서 stealth 검사(전체 픽셀 디코딩)를 반복하지 않음
+                # 읽기 중 오류가 난 파일은 일시적인 오류일 수 있으므로 어느 캐시에도 기록하지 않음
+                read_ok = result["status"] != "error" and not result.get("read_failed")
+                if read_ok and st is not None:
+                    remember_prompt(path, st, prompt_data)
+
+                if result["status"] == "success":
+                    matched_keyword = result["keyword"]
+                    file_size = result.get("size", 0)
+                    keyword_dir = process_image_file(img_dir, img_file, img_path, file_size, matched_keyword, keyword_counters, operation_type, prompt_data)
+                    if keyword_dir:
+                        next_dirs[keyword_dir] = None
+                elif result["status"] in ["no_keyword_match", "no_prompt"]:
+                    add_unmatched((img_dir, img_file, img_path, result.get("size", 0), prompt_data if read_ok else None))
 
-                except Exception as e:
-                    path = future_to_path[future]
-                    img_file = os.path.basename(path)
-                    self.log_updated.emit(f"{img_file} 처리 중 심각한 오류 발생: {e}")
+            except Exception as e:
+                log(f"{img_file} 처리 중 심각한 오류 발생: {e}")
 
-                processed_count += 1
-                progress = int((processed_count / total_images) * 100) if total_images > 0 else 0
-                self.progress_updated.emit(progress)
+            processed_count += 1
+            progress = int((processed_count / total_images) * 100) if total_images > 0 else 0
+            if progress != last_progress:
+                last_progress = progress
+                emit_progress(progress)
 
         if self.handle_others and unmatched_images:
-            self.log_updated.emit(f"{len(unmatched_images)}개의 분류되지 않은 파일을 'other' 폴더로 이동합니다...")
+            log(f"{len(unmatched_images)}개의 분류되지 않은 파일을 'other' 폴더로 이동합니다...")
             other_counters = {'other': 0}
-            for img_dir, img_file, img_path, file_size in unmatched_images:
-                if self.canceled: break
-                self._process_image_file(img_dir, img_file, img_path, file_size, 'other', other_counters, operation_type)
+            for img_dir, img_file, img_path, file_size, prompt_data in unmatched_images:
+                if is_canceled(): break
+                process_image_file(img_dir, img_file, img_path, file_size, 'other', other_counters, operation_type, prompt_data)
 
-        return next_dirs
+        # 레벨이 끝나면 남은 로그를 바로 표시
+        self._flush_log()
+        return list(next_dirs)
 
-    def _process_image_file(self, img_dir, img_file, img_path, file_size, keyword, counters, operation_type):
+    def _process_image_file(self, img_dir, img_file, img_path, file_size, keyword, counters, operation_type, prompt_data=None):
         sanitized_keyword = sanitize_for_path(keyword)
 
         if self.custom_dest_enabled and self.custom_dest_path:
@@ -219,88 +615,146 @@ class ImageClassifierWorker(QThread):
         else:
             target_dir = os.path.join(img_dir, sanitized_keyword)
 
-        if not os.path.exists(target_dir):
-            try:
-                os.makedirs(target_dir, exist_ok=True)
-                self.created_dirs.append(target_dir)
-            except OSError as e:
-                self.log_updated.emit(f"오류: 대상 폴더를 생성할 수 없습니다: {target_dir}. 건너뜁니다. ({e})")
-                return None
+        if target_dir not in self._known_dirs:
+            if not os.path.exists(target_dir):
+                try:
+                    os.makedirs(target_dir, exist_ok=True)
+                    self.created_dirs.append(target_dir)
+                except OSError as e:
+                    self._log(f"오류: 대상 폴더를 생성할 수 없습니다: {target_dir}. 건너뜁니다. ({e})")
+                    return None
+            self._known_dirs.add(target_dir)
 
         if self.rename_images:
             counters[keyword] += 1
-            dest_filename = f"{sanitized_keyword}_{str(counters[keyword]).zfill(6)}{os.path.splitext(img_file)[1]}"
+            dest_filename = f"{sanitized_keyword}_{counters[keyword]:06d}{os.path.splitext(img_file)[1]}"
         else:
             dest_filename = img_file
 
         dest_path = os.path.join(target_dir, dest_filename)
 
-        if os.path.exists(dest_path) and not self.resolve_conflicts:
-            self.log_updated.emit(f"경고: '{os.path.basename(dest_path)}' 파일이 이미 존재하여 건너뜁니다.")
+        # 존재 여부는 한 번만 확인하고, 로그용 파일 이름은 경로에서 다시 분리하지 않고 그대로 사용
+        dest_exists = os.path.exists(dest_path)
+        if dest_exists and not self.resolve_conflicts:
+            self._log(f"경고: '{dest_filename}' 파일이 이미 존재하여 건너뜁니다.")
             return None
-        elif os.path.exists(dest_path) and self.resolve_conflicts:
-            base, ext = os.path.splitext(dest_path)
-            counter = 1
-            new_dest_path = f"{base} ({str(counter).zfill(2)}){ext}"
-            while os.path.exists(new_dest_path):
-                counter += 1
-                new_dest_path = f"{base} ({str(counter).zfill(2)}){ext}"
-            dest_path = new_dest_path
-            self.log_updated.emit(f"알림: 이름 충돌로 '{os.path.basename(dest_path)}'(으)로 저장")
+        reserved_path = None
+        if dest_exists and self.resolve_conflicts:
+            base, ext = os.path.splitext(dest_filename)
+            conflict_key = (target_dir, base, ext)
+            try:
+                reserved_path, counter = reserve_numbered_path(target_dir, base, ext, self._conflict_next.get(conflict_key, 1))
+                dest_path = reserved_path
+                self._conflict_next[conflict_key] = counter + 1
+            except OSError as e:
+                self._log(f"오류: {img_file}을(를) {target_dir}(으)로 처리하는 중 오류 발생: {e}")
+                return None
+            self._log(f"알림: 이름 충돌로 '{os.path.basename(dest_path)}'(으)로 저장")
 
         try:
             if operation_type == 'copy':
                 shutil.copy2(img_path, dest_path)
             else: # 'move'
-                shutil.move(img_path, dest_path)
+                move_file(img_path, dest_path)
 
-            self.processed_files_info.append({'src': img_path, 'dest': dest_path, 'size': file_size})
-
-            if not self.safe_mode_enabled:
+            self.processed_count += 1
+            if self.safe_mode_enabled:
+                self.processed_files_info.append({'src': img_path, 'dest': dest_path, 'size': file_size})
+            else:
                  self.undo_info.append({'src': img_path, 'dest': dest_path, 'op': operation_type})
 
-            self.log_updated.emit(f"{img_file} -> {os.path.relpath(dest_path, self.source_dir)}")
+            # 옮긴 파일은 원래 경로에 더 이상 없으므로 디스크 캐시에서 제거
+            if operation_type == 'move' and self._disk_cache.pop(img_path, None) is not None:
+                self._disk_cache_dirty = True
+            # 다음 레벨은 이동/복사된 위치의 파일을 처리하므로 새 경로로 프롬프트를 캐시
+            if prompt_data is not None:
+                self._cache_prompt(dest_path, prompt_data)
+
+            self._log(f"{img_file} -> {os.path.relpath(dest_path, self.source_dir)}")
             return target_dir
         except Exception as e:
-            self.log_updated.emit(f"오류: {img_file}을(를) {dest_path}(으)로 처리하는 중 오류 발생: {e}")
+            self._log(f"오류: {img_file}을(를) {dest_path}(으)로 처리하는 중 오류 발생: {e}")
+            # 선점해 둔 빈 파일은 남기지 않고, 비워진 번호를 다시 쓸 수 있도록 다음 충돌은 처음부터 확인
+            if reserved_path is not None:
+                try:
+                    os.remove(reserved_path)
+                except OSError:
+                    pass
+                self._conflict_next.pop(conflict_key, None)
             return None
 
+    def _cache_prompt(self, path, prompt_data):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self._prompt_cache[(path, st.st_mtime_ns, st.st_size)] = prompt_data
+        self._remember_prompt(path, st, prompt_data)
+
+    def _remember_prompt(self, path, st, prompt_data):
+        """
+        다음 실행에서 다시 읽지 않도록 디스크 캐시에 기록합니다. (빈 문자열은 '프롬프트 없음' 결과)
+        캐시 파일이 커지지 않도록 아주 긴 프롬프트는 기록하지 않습니다.
+        항목 수는 PROMPT_CACHE_MAX_ENTRIES를 넘지 않으며, 가득 차면 이번 실행에서 쓰지 않은 가장 오래된 항목을 버립니다.
+        남은 항목이 모두 이번 실행의 것이면 새 항목을 넣지 않으므로, 큰 폴더에서도 실행마다 캐시를 갈아엎지 않고
+        앞서 기록된 파일들은 다음 실행에서 계속 재사용됩니다.
+        """
+        if len(prompt_data) > DISK_CACHE_MAX_PROMPT_CHARS:
+            return
+        entry = [st.st_mtime_ns, st.st_size, prompt_data]
+        disk_cache = self._disk_cache
+        old_entry = disk_cache.pop(path, None)
+        if old_entry is None and len(disk_cache) >= PROMPT_CACHE_MAX_ENTRIES:
+            oldest = next(iter(disk_cache))
+            if oldest in self._disk_cache_used:
+                return
+            del disk_cache[oldest]
+            self._disk_cache_dirty = True
+        if old_entry != entry:
+            self._disk_cache_dirty = True
+        # 최근에 쓴 항목이 뒤에 오도록 다시 넣음
+        disk_cache[path] = entry
+        self._disk_cache_used.add(path)
+
     def finalize_safe_mode(self, choice):
         if choice == "delete": # 원본 삭제
-            self.log_updated.emit("원본 파일을 삭제합니다...")
+            self._log("원본 파일을 삭제합니다...")
             for info in self.processed_files_info:
                 try:
                     if os.path.exists(info['src']):
                         os.remove(info['src'])
                     self.undo_info.append({'src': info['src'], 'dest': info['dest'], 'op': 'move'})
                 except Exception as e:
-                    self.log_updated.emit(f"오류: 원본 파일 {info['src']} 삭제 실패: {e}")
-            self.log_updated.emit("원본 파일 삭제 완료.")
+                    self._log(f"오류: 원본 파일 {info['src']} 삭제 실패: {e}")
+            self._log("원본 파일 삭제 완료.")
         elif choice == "keep": # 모두 보존
-             self.log_updated.emit("원본과 복사본을 모두 보존합니다.")
+             self._log("원본과 복사본을 모두 보존합니다.")
              for info in self.processed_files_info:
                  self.undo_info.append({'src': info['src'], 'dest': info['dest'], 'op': 'copy'})
         elif choice == "undo": # 실행 취소 (복사본 삭제)
-            self.log_updated.emit("복사된 파일을 삭제하여 실행을 취소합니다...")
+            self._log("복사된 파일을 삭제하여 실행을 취소합니다...")
             for info in self.processed_files_info:
                 try:
                     if os.path.exists(info['dest']):
                         os.remove(info['dest'])
                 except Exception as e:
-                    self.log_updated.emit(f"오류: 복사본 {info['dest']} 삭제 실패: {e}")
-            self.undo_info = [] # Undo is done, clear list.
-            self.log_updated.emit("복사본 삭제 완료.")
+                    self._log(f"오류: 복사본 {info['dest']} 삭제 실패: {e}")
+            self.undo_info.clear() # Undo is done, clear list.
+            self._log("복사본 삭제 완료.")
 
-        self.completed.emit(len(self.processed_files_info) if choice != "undo" else 0)
+        self._flush_log()
+        self.completed.emit(self.processed_count if choice != "undo" else 0)
 
     def undo_last_operation(self):
         if not self.undo_info:
-            self.log_updated.emit("취소할 작업이 없습니다.")
+            self._log("취소할 작업이 없습니다.")
+            self._flush_log()
             return
 
         success_count = 0
-        self.log_updated.emit("이전 작업을 취소하는 중...")
+        self._log("이전 작업을 취소하는 중...")
 
+        restored_dirs = set()
         for info in reversed(self.undo_info):
             try:
                 dest_path = info['dest']
@@ -309,31 +763,42 @@ class ImageClassifierWorker(QThread):
 
                 if op_type == 'move':
                     if os.path.exists(dest_path):
-                        os.makedirs(os.path.dirname(src_path), exist_ok=True)
-                        shutil.move(dest_path, src_path)
+                        src_dir = os.path.dirname(src_path)
+                        if src_dir not in restored_dirs:
+                            os.makedirs(src_dir, exist_ok=True)
+                            restored_dirs.add(src_dir)
+                        move_file(dest_path, src_path)
                         success_count += 1
                 elif op_type == 'copy':
                     if os.path.exists(dest_path):
                         os.remove(dest_path)
                         success_count += 1
             except Exception as e:
-                self.log_updated.emit(f"파일 복원/삭제 중 오류 발생: {str(e)}")
+                self._log(f"파일 복원/삭제 중 오류 발생: {str(e)}")
 
-        # 생성된 빈 디렉토리 정리
-        for dir_path in reversed(self.created_dirs):
+        # 생성된 빈 디렉토리 정리 (깊은 폴더부터 바로 rmdir, 비어 있지 않거나 이미 없는 폴더는 건너뜀)
+        for dir_path in sorted(self.created_dirs, key=lambda path: path.count(os.sep), reverse=True):
             try:
-                if os.path.exists(dir_path) and not os.listdir(dir_path):
-                    os.rmdir(dir_path)
-            except Exception as e:
-                self.log_updated.emit(f"디렉토리 제거 중 오류 발생: {str(e)}")
+                os.rmdir(dir_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    self._log(f"디렉토리 제거 중 오류 발생: {str(e)}")
 
-        self.log_updated.emit(f"{success_count}개 파일에 대한 작업을 취소했습니다.")
-        self.undo_info = []
+        self._log(f"{success_count}개 파일에 대한 작업을 취소했습니다.")
+        self._flush_log()
+        self.undo_info.clear()
         self.created_dirs = []
         self.processed_files_info = []
+        self.processed_count = 0
+
+    @property
+    def canceled(self):
+        return self._cancel_event.is_set()
 
     def cancel(self):
-        self.canceled = True
+        self._cancel_event.set()
 
 
 class ImageClassifierApp(QMainWindow):
@@ -345,6 +810,7 @@ class ImageClassifierApp(QMainWindow):
         self.source_dir = ""
         self.worker = None
         self.start_time = 0
+        self._scroll_pending = False
         self.settings_manager = SettingsManager()
         self.init_ui()
 
@@ -483,7 +949,7 @@ class ImageClassifierApp(QMainWindow):
                 level_check.setChecked(False)
                 prompt_input.setText("")
 
-        self.log_text.append(f"프리셋 '{preset_name}'을(를) 로드했습니다.")
+        self.log_text.appendPlainText(f"프리셋 '{preset_name}'을(를) 로드했습니다.")
 
     def delete_preset(self):
         if self.preset_combo.currentIndex() <= 0:
@@ -594,7 +1060,8 @@ class ImageClassifierApp(QMainWindow):
         self.progress_bar = QProgressBar()
         main_layout.addWidget(self.progress_bar)
         main_layout.addWidget(QLabel("로그:"))
-        self.log_text = QTextEdit()
+        # 서식이 없는 로그이므로 서식 있는 텍스트 레이아웃이 필요 없는 QPlainTextEdit 사용
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
         main_layout.addWidget(self.log_text)
 
@@ -698,7 +1165,8 @@ class ImageClassifierApp(QMainWindow):
             custom_dest_enabled=self.custom_dest_check.isChecked(),
             custom_dest_path=self.custom_dest_path_input.text(),
             safe_mode_enabled=self.safe_mode_check.isChecked(),
-            clone_mode_enabled=self.clone_mode_check.isChecked()
+            clone_mode_enabled=self.clone_mode_check.isChecked(),
+            settings_manager=self.settings_manager
         )
         self.worker.progress_updated.connect(self.update_progress)
         self.worker.log_updated.connect(self.update_log)
@@ -732,19 +1200,26 @@ class ImageClassifierApp(QMainWindow):
     def cancel_classification(self):
         if self.worker and self.worker.isRunning():
             self.worker.cancel()
-            self.log_text.append("작업 취소 중...")
+            self.log_text.appendPlainText("작업 취소 중...")
             self.cancel_btn.setEnabled(False)
 
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
     def update_log(self, message):
-        self.log_text.append(message)
+        self.log_text.appendPlainText(message)
+        # 로그가 연달아 들어올 때는 스크롤을 50ms에 한 번만 맨 아래로 이동
+        if not self._scroll_pending:
+            self._scroll_pending = True
+            QTimer.singleShot(50, self._scroll_log_to_bottom)
+
+    def _scroll_log_to_bottom(self):
+        self._scroll_pending = False
         self.log_text.verticalScrollBar().setValue(self.log_text.verticalScrollBar().maximum())
 
     def classification_completed(self, classified_count):
         duration = time.time() - self.start_time
-        self.log_text.append(f"분류가 완료되었습니다! (총 소요 시간: {duration:.2f}초, 처리된 이미지: {classified_count}개)")
+        self.log_text.appendPlainText(f"분류가 완료되었습니다! (총 소요 시간: {duration:.2f}초, 처리된 이미지: {classified_count}개)")
         self.start_btn.setEnabled(True)
         self.cancel_btn.setEnabled(False)
         self.undo_btn.setEnabled(True)
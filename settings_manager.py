@@ -3,11 +3,19 @@
 설정 저장, 로드 및 프리셋 관리 기능 제공
 """
 import os
+import gzip
 import json
+import zlib
 import logging
 import sys
 from typing import Dict, List, Tuple, Any, Optional, Union
 
+# 디스크 프롬프트 캐시에 보관할 최대 파일 수 (초과하면 가장 오래전에 기록된 항목부터 버림)
+# 긴 NAI/ComfyUI 프롬프트도 캐시 파일이 수 MB를 넘지 않도록 제한
+# 실행 중에도 이 개수를 넘지 않으므로, 이보다 많은 이미지가 있는 폴더에서는 일부 파일만 다시 읽기를 건너뜀
+PROMPT_CACHE_MAX_ENTRIES = 10000
+# 캐시 파일 구조 버전 (저장 형식을 바꾸면 올림)
+PROMPT_CACHE_FORMAT_VERSION = 1
 
 class SettingsManager:
     """
@@ -31,6 +39,8 @@ class SettingsManager:
             self.settings_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), app_name)
         self.settings_file = os.path.join(self.settings_dir, "settings.json")
         self.presets_dir = os.path.join(self.settings_dir, "presets")
+        # 이전 실행에서 읽은 프롬프트 캐시 (이미지 폴더에는 파일을 만들지 않도록 설정 폴더에 저장)
+        self.prompt_cache_file = os.path.join(self.settings_dir, "prompt_cache.json.gz")
         
         # 로깅 설정
         self.logger = logging.getLogger(app_name)
@@ -41,6 +51,9 @@ class SettingsManager:
         # 기본 설정
         self.default_settings = self._get_default_settings()
         
+        # 마지막으로 파일에 기록한 설정의 JSON 문자열 (변경이 없으면 다시 쓰지 않음)
+        self._last_saved_json: Optional[str] = None
+
         # 현재 설정 로드
         self.current_settings = self.load_settings()
     
@@ -84,7 +97,10 @@ class SettingsManager:
             try:
                 with open(self.settings_file, 'r', encoding='utf-8') as f:
                     settings = json.load(f)
-                return self._validate_settings(settings)
+                validated = self._validate_settings(settings)
+                # 불러온 설정을 바꾸지 않고 종료하면 다시 쓰지 않도록 저장 시와 같은 형식으로 기록
+                self._last_saved_json = json.dumps(validated, ensure_ascii=False, indent=2)
+                return validated
             except (json.JSONDecodeError, IOError) as e:
                 self.logger.error(f"설정 로드 중 오류 발생: {e}")
                 return self.default_settings.copy()
@@ -142,13 +158,69 @@ class SettingsManager:
             validated_settings = self._validate_settings(settings)
             self.current_settings = validated_settings
             
+            # 마지막으로 저장한 내용과 같으면 파일 쓰기를 생략
+            settings_json = json.dumps(validated_settings, ensure_ascii=False, indent=2)
+            if settings_json == self._last_saved_json:
+                return True
+
             with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(validated_settings, f, ensure_ascii=False, indent=2)
+                f.write(settings_json)
+            self._last_saved_json = settings_json
             return True
         except (IOError, TypeError) as e:
             self.logger.error(f"설정 저장 중 오류 발생: {e}")
             return False
 
+    def load_prompt_cache(self, extractor_version: int) -> Dict[str, list]:
+        """
+        디스크에 저장된 프롬프트 캐시 로드
+
+        Args:
+            extractor_version: 현재 프롬프트 추출 방식의 버전. 캐시를 만든 버전과 다르면 캐시를 버림
+
+        Returns:
+            {이미지 경로: [mtime_ns, 크기, 프롬프트]} 딕셔너리. 파일이 없거나 손상되었거나 버전이 다르면 빈 딕셔너리
+        """
+        if not os.path.exists(self.prompt_cache_file):
+            return {}
+        try:
+            with gzip.open(self.prompt_cache_file, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, EOFError, ValueError, zlib.error) as e:
+            # 손상되었거나 쓰다 만 파일 (gzip/zlib 오류, 잘못된 UTF-8, 깨진 JSON)
+            self.logger.error(f"프롬프트 캐시 로드 중 오류 발생: {e}")
+            return {}
+        if (not isinstance(data, dict) or data.get("format") != PROMPT_CACHE_FORMAT_VERSION
+                or data.get("extractor") != extractor_version or not isinstance(data.get("entries"), dict)):
+            self.logger.info("프롬프트 캐시 버전이 달라 캐시를 사용하지 않습니다.")
+            return {}
+        return {path: entry for path, entry in data["entries"].items()
+                if isinstance(entry, list) and len(entry) == 3 and isinstance(entry[2], str)}
+
+    def save_prompt_cache(self, cache: Dict[str, list], extractor_version: int) -> bool:
+        """
+        프롬프트 캐시를 저장 (최근에 기록된 PROMPT_CACHE_MAX_ENTRIES개만 유지)
+
+        Args:
+            cache: {이미지 경로: [mtime_ns, 크기, 프롬프트]} 딕셔너리 (기록된 순서 유지)
+            extractor_version: 캐시의 프롬프트를 추출한 방식의 버전
+
+        Returns:
+            성공 여부
+        """
+        items = list(cache.items())[-PROMPT_CACHE_MAX_ENTRIES:]
+        data = {"format": PROMPT_CACHE_FORMAT_VERSION, "extractor": extractor_version, "entries": dict(items)}
+        temp_file = self.prompt_cache_file + ".tmp"
+        try:
+            # 빠르게 쓰도록 압축 수준 1 사용, 임시 파일에 쓴 뒤 교체하여 중간에 끊겨도 기존 캐시가 깨지지 않음
+            with gzip.open(temp_file, 'wt', encoding='utf-8', compresslevel=1) as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.prompt_cache_file)
+            return True
+        except (OSError, TypeError) as e:
+            self.logger.error(f"프롬프트 캐시 저장 중 오류 발생: {e}")
+            return False
+
     def get_preset_list(self) -> List[str]:
         """
         사용 가능한 프리셋 목록 반환
@@ -0,0 +1,63 @@
+"""
+프롬프트 캐시 저장/로드 테스트
+"""
+import os
+import sys
+import gzip
+import logging
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from settings_manager import SettingsManager
+
+
+class PromptCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # 설정 폴더를 만들지 않도록 캐시에 필요한 속성만 지정
+        self.manager = SettingsManager.__new__(SettingsManager)
+        self.manager.logger = logging.getLogger("PromptCacheTest")
+        self.manager.prompt_cache_file = os.path.join(self.temp_dir.name, "prompt_cache.json.gz")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        cache = {
+            "/images/a.png": [1, 10, "1girl, 한국어 프롬프트"],
+            "/images/b.png": [2, 20, ""],
+        }
+        self.assertTrue(self.manager.save_prompt_cache(cache, 1))
+        self.assertEqual(self.manager.load_prompt_cache(1), cache)
+
+    def test_missing_file(self):
+        self.assertEqual(self.manager.load_prompt_cache(1), {})
+
+    def test_version_mismatch(self):
+        self.manager.save_prompt_cache({"/images/a.png": [1, 10, "cat"]}, 1)
+        self.assertEqual(self.manager.load_prompt_cache(2), {})
+
+    def test_corrupt_file(self):
+        # gzip이 아닌 파일
+        with open(self.manager.prompt_cache_file, 'wb') as f:
+            f.write(b"not a gzip file")
+        self.assertEqual(self.manager.load_prompt_cache(1), {})
+
+        # 중간에 끊긴 gzip 파일
+        self.manager.save_prompt_cache({"/images/a.png": [1, 10, "cat" * 100]}, 1)
+        with open(self.manager.prompt_cache_file, 'rb') as f:
+            data = f.read()
+        with open(self.manager.prompt_cache_file, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        self.assertEqual(self.manager.load_prompt_cache(1), {})
+
+        # 압축은 정상이지만 JSON이 깨진 파일
+        with gzip.open(self.manager.prompt_cache_file, 'wt', encoding='utf-8') as f:
+            f.write('{"format": 1, "entries": ')
+        self.assertEqual(self.manager.load_prompt_cache(1), {})
+
+
+if __name__ == "__main__":
+    unittest.main()